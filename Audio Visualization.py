@@ -1,21 +1,15 @@
 import tkinter as tk
 from tkinter import filedialog, colorchooser, messagebox, ttk
 from threading import Thread
-import webbrowser
 import os
-import platform
-import youtube_utils
-from PIL import Image, ImageTk
 import sys
 import io
-import time
+import queue
 
 # Ensure parent directory is on sys.path so relative imports work
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from audioVisualization.main import main as run_main
 from config import sanitize_filename
-import visualization
 
 class ColorPreviewWindow(tk.Toplevel):
     def __init__(self, master, combined_path, album_title):
@@ -46,6 +40,9 @@ class ColorPreviewWindow(tk.Toplevel):
     def update_preview(self):
         rgb = (self.r.get(), self.g.get(), self.b.get())
         try:
+            from PIL import Image, ImageTk
+            import visualization
+
             image_files = sorted([
                 os.path.join(self.output_folder, f)
                 for f in os.listdir(self.output_folder)
@@ -83,7 +80,12 @@ class VisualizerGUI:
         self.custom_color = None
         self.output_image_path = None
 
+        # Pipeline output arrives from a worker thread; it is queued and written to the log in batches
+        self.log_queue = queue.Queue()
+        self.pending_progress = None
+
         self.build_ui()
+        self.root.after(100, self.drain_log)
 
     def build_ui(self):
         main_frame = tk.Frame(self.root, bg="#1e1e1e")
@@ -201,6 +203,25 @@ class VisualizerGUI:
         self.status_text.insert(tk.END, message + "\n")
         self.status_text.see(tk.END)
 
+    def flush_log(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self.log("\n".join(lines))
+
+        if self.pending_progress is not None:
+            self.progress['value'] = self.pending_progress
+            self.pending_progress = None
+
+    def drain_log(self):
+        # One insert and one scroll per tick, however many lines the pipeline printed
+        self.flush_log()
+        self.root.after(100, self.drain_log)
+
     def pick_color(self):
         if not self.output_image_path or not os.path.exists(self.output_image_path):
             self.log("⚠️ No combined image to update.")
@@ -252,45 +273,70 @@ class VisualizerGUI:
             return
 
         self.log(f"🔎 Searching for: {query}")
+        self.progress.config(mode="indeterminate")
+        self.progress.start()
+        # yt-dlp lookups take seconds, so run them off the Tk thread and hand results back via after()
+        Thread(target=self.search_worker, args=(query,), daemon=True).start()
 
-        if "youtube.com" in query or "youtu.be" in query or "list=" in query:
-            try:
-                info = youtube_utils.load_youtube_url(query)
-                if not info:
-                    self.log("❌ Could not load video or playlist. It may not contain multiple tracks or chapters.")
-                    return
-                self.query_results = [info]
-                self.result_listbox.delete(0, tk.END)
-                self.result_listbox.insert(tk.END, info.get('title', 'Direct Video/Playlist'))
-                self.result_listbox.select_set(0)
-                self.result_listbox.activate(0)
-                self.log(f"✅ Loaded: {info.get('title')}")
-            except Exception as e:
-                self.log(f"❌ Error loading link: {e}")
-            return
+    def search_worker(self, query):
+        import youtube_utils
 
+        results, error = None, None
         try:
-            results = youtube_utils.search_youtube_playlist(query + " playlist", return_entries_only=True)
-            if not results:
-                results = youtube_utils.search_youtube_playlist(query + " full album", return_entries_only=True)
+            if "youtube.com" in query or "youtu.be" in query or "list=" in query:
+                info = youtube_utils.load_youtube_url(query)
+                results = [info] if info else None
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+
+                # Run all three searches at once, then take the first non-empty one in order of preference
+                queries = [query + " playlist", query + " full album", query]
+                with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+                    searches = [
+                        pool.submit(youtube_utils.search_youtube_playlist, q, return_entries_only=True)
+                        for q in queries
+                    ]
+                    for search in searches:
+                        results = search.result()
+                        if results:
+                            break
+        except Exception as e:
+            error = e
 
-            if not results:
-                results = youtube_utils.search_youtube_playlist(query, return_entries_only=True)
+        self.root.after(0, self.show_search_results, query, results, error)
+
+    def show_search_results(self, query, results, error):
+        self.progress.stop()
+        self.progress.config(mode="determinate")
+        self.progress['value'] = 0
+
+        is_link = "youtube.com" in query or "youtu.be" in query or "list=" in query
+        if error:
+            self.log(f"❌ Error loading link: {error}" if is_link else f"❌ Search failed: {error}")
+            return
 
-            if not results:
+        if not results:
+            if is_link:
+                self.log("❌ Could not load video or playlist. It may not contain multiple tracks or chapters.")
+            else:
                 self.log("❌ No search results found.")
-                return
+            return
 
-            self.query_results = results
-            self.result_listbox.delete(0, tk.END)
+        self.query_results = results
+        self.result_listbox.delete(0, tk.END)
+        if is_link:
+            self.result_listbox.insert(tk.END, results[0].get('title', 'Direct Video/Playlist'))
+        else:
             for idx, result in enumerate(self.query_results):
                 title = result.get('title', f"Option {idx+1}")
                 self.result_listbox.insert(tk.END, title)
-            self.result_listbox.select_set(0)
-            self.result_listbox.activate(0)
+        self.result_listbox.select_set(0)
+        self.result_listbox.activate(0)
+
+        if is_link:
+            self.log(f"✅ Loaded: {results[0].get('title')}")
+        else:
             self.log(f"✅ Found {len(self.query_results)} results. Click one, then 'Select and Visualize'.")
-        except Exception as e:
-            self.log(f"❌ Search failed: {e}")
 
     def start_visualization(self):
         selected = self.result_listbox.curselection()
@@ -320,16 +366,16 @@ class VisualizerGUI:
     def run_pipeline(self):
         try:
             import contextlib
+            from audioVisualization.main import main as run_main
 
             class StreamInterceptor(io.StringIO):
                 def write(this, txt):
                     if txt.strip():
-                        self.log(txt.strip())
+                        self.log_queue.put(txt.strip())
                         if txt.startswith("[PROGRESS]"):
                             try:
-                                percent = int(txt.split()[1].replace("%", ""))
-                                self.progress['value'] = percent
-                            except:
+                                self.pending_progress = int(txt.split()[1].replace("%", ""))
+                            except (IndexError, ValueError):
                                 pass
                         elif txt.startswith("[OUTPUT]"):
                             self.output_image_path = txt.replace("[OUTPUT]", "").strip()
@@ -339,36 +385,49 @@ class VisualizerGUI:
             with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(stream):
                 run_main()
 
-            self.log("✅ Done generating image.")
-            self.color_button.config(state="normal")  # allow recoloring now
-            self.load_preview()
+            self.root.after(0, self.pipeline_finished)
         except Exception as e:
-            self.log(f"❌ Error: {e}")
+            self.log_queue.put(f"❌ Error: {e}")
+
+    def pipeline_finished(self):
+        self.flush_log()
+        self.log("✅ Done generating image.")
+        self.color_button.config(state="normal")  # allow recoloring now
+        self.load_preview()
 
     def load_preview(self):
-        time.sleep(0.5)
-        if not self.output_image_path:
-            self.log("⚠️ No output image path set.")
+        # Decoding a large combined PNG takes a while, so build the thumbnail off the Tk thread
+        Thread(target=self.preview_worker, args=(self.output_image_path,), daemon=True).start()
+
+    def preview_worker(self, image_path):
+        # Every caller sets the path only after the image has been saved ([OUTPUT] is printed after
+        # create_combined_image returns), so the file is checked once instead of polled
+        if not image_path:
+            self.root.after(0, self.log, "⚠️ No output image path set.")
             return
 
-        for _ in range(5):
-            if os.path.exists(self.output_image_path):
-                break
-            time.sleep(0.5)
+        if not os.path.exists(image_path):
+            self.root.after(0, self.log, f"⚠️ Image file not found: {image_path}")
+            return
 
-        if os.path.exists(self.output_image_path):
-            try:
-                img = Image.open(self.output_image_path)
+        try:
+            from PIL import Image
+
+            with Image.open(image_path) as img:
                 img.thumbnail((200, 200))
-                img_tk = ImageTk.PhotoImage(img)
-                self.image_label.configure(image=img_tk)
-                self.image_label.image = img_tk
-                self.save_button.config(state="normal")
-                self.log("✅ Image preview loaded.")
-            except Exception as e:
-                self.log(f"⚠️ Error loading image preview: {e}")
-        else:
-            self.log(f"⚠️ Image file not found: {self.output_image_path}")
+        except Exception as e:
+            self.root.after(0, self.log, f"⚠️ Error loading image preview: {e}")
+            return
+        self.root.after(0, self.show_preview, img)
+
+    def show_preview(self, img):
+        from PIL import ImageTk
+
+        img_tk = ImageTk.PhotoImage(img)
+        self.image_label.configure(image=img_tk)
+        self.image_label.image = img_tk
+        self.save_button.config(state="normal")
+        self.log("✅ Image preview loaded.")
 
     def save_image(self):
         if self.output_image_path:
@@ -1,41 +1,79 @@
+from functools import lru_cache
 import numpy as np
 from scipy.io import wavfile
 from scipy import signal
+from scipy import fft as sp_fft
 
-def process_audio(file_path, segment_duration=0.05):
+# Frequency range (Hz) mapped logarithmically onto the 400-700nm wavelength scale
+F_MIN = 20
+F_MAX = 20000
+LOG_F_MIN = np.log10(F_MIN)
+LOG_F_MAX = np.log10(F_MAX)
+
+# Maximum number of segments (image columns) analyzed per track
+MAX_SEGMENTS = 1000
+
+def load_audio(file_path, max_duration=None):
     """
-    Process audio from a local .wav file and convert dominant frequencies to RGB colors
+    Read a local .wav file and return its sample rate and mono float32 samples normalized to [-1, 1],
+    keeping at most the first max_duration seconds
     """
+    # Memory-map the file so only the pages of the analyzed window are read from disk;
+    # scipy can't map 24-bit PCM, so those files are read in full
     try:
-        print(f"Reading audio file: {file_path}")
+        sample_rate, audio_data = wavfile.read(file_path, mmap=True)
+    except ValueError:
         sample_rate, audio_data = wavfile.read(file_path)
 
-        # Convert to mono if stereo
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
+    # Trim to the analyzed window before any float conversion so the rest of the file is never copied
+    if max_duration is not None:
+        audio_data = audio_data[:int(np.ceil(max_duration * sample_rate))]
+
+    # Mix channels straight into a single float32 buffer, then offset and scale it in place,
+    # so the only full-size allocation is the mono output itself
+    channels = audio_data.shape[1] if audio_data.ndim > 1 else 1
+    if channels > 1:
+        mono = np.add.reduce(audio_data, axis=1, dtype=np.float32)
+    else:
+        mono = np.array(audio_data.reshape(-1), dtype=np.float32)
+
+    # Normalize integer PCM by the range of its own sample type; float WAVs are already in [-1, 1]
+    if np.issubdtype(audio_data.dtype, np.integer):
+        info = np.iinfo(audio_data.dtype)
+        offset = (int(info.max) + 1) // 2 if info.min == 0 else 0
+        if offset:
+            mono -= np.float32(offset * channels)
+        mono *= np.float32(1.0 / ((int(info.max) - offset) * channels))
+    elif channels > 1:
+        mono *= np.float32(1.0 / channels)
 
-        # Normalize
-        if audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
-            max_val = np.iinfo(np.int16).max if audio_data.max() > 1.0 else 1.0
-            audio_data = audio_data / max_val
+    return sample_rate, mono
+
+def process_audio(file_path, segment_duration=0.05, workers=-1):
+    """
+    Process audio from a local .wav file and convert dominant frequencies to RGB colors,
+    returned as an (N, 3) uint8 array with one row per segment. workers caps the FFT's threads
+    (-1 uses every core); callers analyzing several tracks at once should split the cores between them
+    """
+    try:
+        print(f"Reading audio file: {file_path}")
+        sample_rate, audio_data = load_audio(file_path, max_duration=MAX_SEGMENTS * segment_duration)
 
         segment_samples = int(segment_duration * sample_rate)
-        num_segments = min(1000, len(audio_data) // segment_samples)
+        num_segments = min(MAX_SEGMENTS, len(audio_data) // segment_samples)
 
         print(f"Analyzing {num_segments} segments...")
-        colors = []
-
-        for i in range(num_segments):
-            segment = audio_data[i * segment_samples:(i + 1) * segment_samples]
-            segment = segment * signal.windows.hann(len(segment))
-            fft_data = np.abs(np.fft.rfft(segment))
-            freq_bins = np.fft.rfftfreq(len(segment), 1 / sample_rate)
-            max_idx = np.argmax(fft_data)
-            max_freq = freq_bins[max_idx]
+        frames = audio_data[:num_segments * segment_samples].reshape(num_segments, segment_samples)
+        frames = frames * hann_window(segment_samples)
+        # Segments are transformed at their natural length: pocketfft handles mixed-radix sizes well,
+        # and zero-padding to a power of two would roughly double the FFT work
+        spectrum = sp_fft.rfft(frames, axis=1, workers=workers, overwrite_x=True)
 
-            rgb = map_frequency_to_rgb(max_freq)
-            colors.append(rgb)
+        # Only search bins inside the mapped F_MIN-F_MAX band, so a DC offset or subsonic rumble
+        # can't win the peak (it would be clamped to the lowest color anyway)
+        lo_bin, hi_bin = audible_bin_range(sample_rate, segment_samples)
+        bins = peak_bins(spectrum, lo_bin, hi_bin)
+        colors = frequency_bin_colors(sample_rate, segment_samples)[bins]
 
         print(f"Generated {len(colors)} colors")
         return colors
@@ -44,60 +82,91 @@ def process_audio(file_path, segment_duration=0.05):
         print(f"Audio processing error: {e}")
 
 
+@lru_cache(maxsize=16)
+def hann_window(segment_samples):
+    """
+    Return a cached float32 Hann window of the given length, shared by every segment and track.
+    Kept in float32 so windowed frames aren't promoted to float64 and rfft returns complex64
+    """
+    window = signal.windows.hann(segment_samples).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+def audible_bin_range(sample_rate, segment_samples):
+    """
+    Return the [lo, hi) range of rfft bins whose frequencies fall within F_MIN-F_MAX
+    """
+    num_bins = segment_samples // 2 + 1
+    lo_bin = int(np.ceil(F_MIN * segment_samples / sample_rate))
+    hi_bin = min(int(F_MAX * segment_samples / sample_rate) + 1, num_bins)
+    if lo_bin >= hi_bin:
+        return 0, num_bins
+    return lo_bin, hi_bin
+
+def peak_bins(spectrum, lo_bin=0, hi_bin=None):
+    """
+    Return the index of the strongest bin within [lo_bin, hi_bin) in each row of a complex spectrum,
+    overwriting the spectrum when it is C-contiguous
+    """
+    if spectrum.flags.c_contiguous:
+        # Square the real/imaginary parts in place and sum them into the real slot, so finding the
+        # peak needs neither a sqrt nor a separate magnitude array
+        parts = spectrum.view(spectrum.real.dtype).reshape(spectrum.shape + (2,))
+        np.square(parts, out=parts)
+        power = parts[..., 0]
+        power += parts[..., 1]
+    else:
+        # numpy < 1.23 can't view a strided complex array as its real parts, so square out of place
+        power = np.square(spectrum.real)
+        power += np.square(spectrum.imag)
+    return power[..., lo_bin:hi_bin].argmax(axis=-1) + lo_bin
+
 def map_frequencies_to_colors(frequencies):
     """
-    Map a list of audio frequencies to RGB colors using a logarithmic scale and wavelength-based color mapping
+    Map an array of audio frequencies to an (N, 3) uint8 array of RGB colors using a logarithmic scale and wavelength-based color mapping
+    """
+    freqs = np.asarray(frequencies, dtype=np.float64)
+    log_f = np.log10(np.maximum(freqs, 1))
+    t = (log_f - LOG_F_MIN) / (LOG_F_MAX - LOG_F_MIN)
+    t = np.clip(t, 0, 1)
+    wavelength = 700 - t * (700 - 400)
+    return wavelengths_to_rgb(wavelength)
+
+@lru_cache(maxsize=8)
+def frequency_bin_colors(sample_rate, segment_samples):
+    """
+    Build a lookup table of RGB colors for every rfft bin of a segment, indexed by bin number.
+    Cached per (sample_rate, segment_samples) since every track in a run shares them
     """
-    return [map_frequency_to_rgb(freq) for freq in frequencies]
+    bin_freqs = np.arange(segment_samples // 2 + 1) * (sample_rate / segment_samples)
+    colors = map_frequencies_to_colors(bin_freqs)
+    colors.setflags(write=False)
+    return colors
 
 def map_frequency_to_rgb(freq):
     """
     Map a single frequency (Hz) to an RGB color via a logarithmic scale mapped to wavelength (400–700nm)
     """
-    def wavelength_to_rgb(wavelength):
-        if wavelength < 380 or wavelength > 780:
-            return (0, 0, 0)
-        if wavelength < 440:
-            R = -(wavelength - 440) / (440 - 380)
-            G = 0.0
-            B = 1.0
-        elif wavelength < 490:
-            R = 0.0
-            G = (wavelength - 440) / (490 - 440)
-            B = 1.0
-        elif wavelength < 510:
-            R = 0.0
-            G = 1.0
-            B = -(wavelength - 510) / (510 - 490)
-        elif wavelength < 580:
-            R = (wavelength - 510) / (580 - 510)
-            G = 1.0
-            B = 0.0
-        elif wavelength < 645:
-            R = 1.0
-            G = -(wavelength - 645) / (645 - 580)
-            B = 0.0
-        else:
-            R = 1.0
-            G = 0.0
-            B = 0.0
-
-        if wavelength < 420:
-            factor = 0.3 + 0.7 * (wavelength - 380) / (420 - 380)
-        elif wavelength > 700:
-            factor = 0.3 + 0.7 * (780 - wavelength) / (780 - 700)
-        else:
-            factor = 1.0
-
-        R = int(max(0, min(255, R * factor * 255)))
-        G = int(max(0, min(255, G * factor * 255)))
-        B = int(max(0, min(255, B * factor * 255)))
-        return (R, G, B)
-
-    log_min = np.log10(20)
-    log_max = np.log10(20000)
-    log_f = np.log10(max(freq, 1))
-    t = (log_f - log_min) / (log_max - log_min)
-    t = np.clip(t, 0, 1)
-    wavelength = 700 - t * (700 - 400)
-    return wavelength_to_rgb(wavelength)
+    return tuple(int(c) for c in map_frequencies_to_colors([freq])[0])
+
+def wavelengths_to_rgb(wavelengths):
+    """
+    Convert an array of wavelengths (nm) to an (N, 3) uint8 array of RGB colors
+    """
+    w = np.asarray(wavelengths, dtype=np.float64)
+    bands = [w < 440, w < 490, w < 510, w < 580, w < 645]
+
+    R = np.select(bands, [-(w - 440) / (440 - 380), 0.0, 0.0, (w - 510) / (580 - 510), 1.0], default=1.0)
+    G = np.select(bands, [0.0, (w - 440) / (490 - 440), 1.0, 1.0, -(w - 645) / (645 - 580)], default=0.0)
+    B = np.select(bands, [1.0, 1.0, -(w - 510) / (510 - 490), 0.0, 0.0], default=0.0)
+
+    factor = np.select(
+        [w < 420, w > 700],
+        [0.3 + 0.7 * (w - 380) / (420 - 380), 0.3 + 0.7 * (780 - w) / (780 - 700)],
+        default=1.0
+    )
+
+    rgb = np.stack([R, G, B], axis=-1) * factor[..., np.newaxis] * 255
+    rgb = np.clip(rgb, 0, 255).astype(np.uint8)
+    rgb[(w < 380) | (w > 780)] = 0
+    return rgb
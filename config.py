@@ -1,9 +1,16 @@
-import re
 import math
+from functools import lru_cache
+
+# Sample rate audio is decoded to for analysis. Dominant peaks in music sit well below
+# its 11 kHz Nyquist limit, so this halves the FFT work of 44.1 kHz audio
+ANALYSIS_SAMPLE_RATE = 22050
+
+# Translation table that deletes characters not allowed in Windows filenames
+INVALID_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
 
 def sanitize_filename(filename):
     """Remove characters not allowed in Windows filenames"""
-    return re.sub(r'[<>:"/\\|?*]', '', filename)
+    return filename.translate(INVALID_FILENAME_CHARS)
 
 def wavelength_to_rgb(wavelength):
     """Convert a wavelength to an RGB color value"""
@@ -52,15 +59,17 @@ def frequency_to_color(f, f_min=20, f_max=20000):
 
 def get_text_color(bg_color):
     """Determine the best text color (black or white) based on background brightness"""
-    # Calculate perceived brightness using the formula: 0.299*R + 0.587*G + 0.114*B
-    r, g, b = bg_color
-    brightness = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-    
+    # Perceived brightness 0.299*R + 0.587*G + 0.114*B compared against half of 255,
+    # scaled by 1000 so it stays in exact integer arithmetic
+    r, g, b = (int(c) for c in bg_color)
+    brightness = 299 * r + 587 * g + 114 * b
+
     # Return white for dark backgrounds, black for light backgrounds
-    return (0, 0, 0) if brightness > 0.5 else (255, 255, 255)
+    return (0, 0, 0) if brightness > 127500 else (255, 255, 255)
 
+@lru_cache(maxsize=None)
 def get_font_path_from_matplotlib(font_name):
-    """Use matplotlib's font manager to find a font path"""
+    """Use matplotlib's font manager to find a font path (cached, since it scans every system font)"""
     try:
         import matplotlib.font_manager as fm
         import os
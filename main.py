@@ -1,5 +1,6 @@
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import audio_processing
 import visualization
 import youtube_utils
@@ -10,6 +11,82 @@ from io import BytesIO
 import numpy as np
 from visualization import get_dominant_color
 
+TRACK_WORKERS = 4
+SEGMENT_DURATION = 0.05
+
+# Tracks are analyzed TRACK_WORKERS at a time, so each track's FFT gets an equal share of the cores
+# instead of every track asking for all of them
+FFT_WORKERS = max(1, (os.cpu_count() or 1) // TRACK_WORKERS)
+
+# One session so thumbnail requests reuse keep-alive connections to img.youtube.com
+http_session = requests.Session()
+
+# Cover colors by video id, so re-running the same album in a session skips the download and color pass
+cover_colors = {}
+
+def fetch_cover_color(video_id):
+    """Return the dominant color of a video's thumbnail, or None if no thumbnail could be fetched"""
+    if video_id in cover_colors:
+        return cover_colors[video_id]
+    thumb_urls = [
+        f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
+        f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"
+    ]
+    # Request both sizes at once and use whichever usable thumbnail arrives first; both are the same cover,
+    # and the near-black letterbox bars of hqdefault are ignored by get_dominant_color
+    pool = ThreadPoolExecutor(max_workers=len(thumb_urls))
+    try:
+        urls_by_request = {pool.submit(http_session.get, url, timeout=10): url for url in thumb_urls}
+        for request in as_completed(urls_by_request):
+            url = urls_by_request[request]
+            try:
+                response = request.result()
+                if response.status_code == 200:
+                    cover_image = Image.open(BytesIO(response.content))
+                    cover_colors[video_id] = get_dominant_color([cover_image])
+                    return cover_colors[video_id]
+            except Exception as e:
+                print(f"[WARN] Thumbnail fetch failed for {url}: {e}")
+    finally:
+        # Don't block on the slower request once a thumbnail has been used
+        pool.shutdown(wait=False)
+    return None
+
+def fetch_track_audio(idx, track, output_folder):
+    """Download a track's audio (or use its local file) and return the audio path and song title"""
+    if 'url' in track:
+        print(f"[DEBUG] Downloading audio for: {track['url']}")
+        audio_file, song_title, _ = youtube_utils.download_youtube_audio_and_metadata(
+            track['url'],
+            output_filename=os.path.join(output_folder, f"track_{idx:02d}.wav"),
+            max_duration=audio_processing.MAX_SEGMENTS * SEGMENT_DURATION
+        )
+    else:
+        print(f"[DEBUG] Using local file: {track['file']}")
+        audio_file = track['file']
+        song_title = track['title']
+    return audio_file, song_title
+
+def render_track(idx, audio_file, song_title, output_folder):
+    """Analyze a track's audio and save its gradient visualization, returning the image path and pixels"""
+    print("[DEBUG] Starting audio analysis...")
+    colors = audio_processing.process_audio(audio_file, segment_duration=SEGMENT_DURATION, workers=FFT_WORKERS)
+    print(f"[DEBUG] Generated {len(colors)} colors")
+
+    base_gradient = visualization.create_gradient_image(colors, height=100, target_width=1000)
+    output_filename = f"{idx:02d}_{sanitize_filename(song_title)}.png"
+    full_output_path = os.path.join(output_folder, output_filename)
+
+    track_image = visualization.create_track_visualization(base_gradient, song_title, full_output_path)
+    print(f"[INFO] Saved visualization: {output_filename}")
+    return full_output_path, np.asarray(track_image)
+
+def process_track(idx, total, track, output_folder):
+    """Fetch, analyze and render a single track, returning its image path and pixels"""
+    print(f"[INFO] Processing track {idx}/{total}: {track['title']}")
+    audio_file, song_title = fetch_track_audio(idx, track, output_folder)
+    return render_track(idx, audio_file, song_title, output_folder)
+
 def main():
     direct_url = os.environ.get("AUDIOVISUALIZER_DIRECT_URL")
     if direct_url:
@@ -34,26 +111,9 @@ def main():
     os.makedirs(output_folder, exist_ok=True)
     print(f"[INFO] Saving to folder: {output_folder}")
 
+    # A valid custom color from the GUI wins over the cover color, so parse it first and only fetch
+    # the album cover when it is needed
     bg_color = None
-    video_id = result.get('id') or (result['entries'][0].get('id') if 'entries' in result else None)
-    if video_id:
-        thumb_urls = [
-            f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
-            f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"
-        ]
-        for url in thumb_urls:
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    cover_image = Image.open(BytesIO(response.content))
-                    bg_color = get_dominant_color([cover_image])
-                    print(f"[INFO] Auto-detected background color from album cover: RGB{bg_color}")
-                    break
-            except Exception as e:
-                print(f"[WARN] Thumbnail fetch failed for {url}: {e}")
-        else:
-            print("[WARN] No usable thumbnail found, using fallback background color.")
-
     env_color = os.environ.get("AUDIOVISUALIZER_COLOR")
     if env_color and env_color.lower() != "auto":
         try:
@@ -64,65 +124,57 @@ def main():
         except Exception as e:
             print(f"[WARN] Invalid custom color input: {env_color}")
 
-    if 'entries' in result:
-        print(f"[INFO] Found playlist: {result.get('title')} with {len(result['entries'])} tracks")
-        tracks = youtube_utils.extract_tracks_from_playlist(result)
-    elif 'chapters' in result:
-        print(f"[INFO] Found chaptered video: {result.get('title')}")
-        tracks = youtube_utils.split_album_video(result, output_folder)
-    else:
-        print(f"[INFO] Found single video: {result.get('title')}")
-        tracks = [{
-            'id': result['id'],
-            'title': result.get('title', 'Full Album'),
-            'url': f"https://www.youtube.com/watch?v={result['id']}"
-        }]
+    # The cover color is only needed for the combined image, so fetch it in the background while the
+    # tracks are split, downloaded and rendered
+    cover_future = None
+    video_id = result.get('id') or (result['entries'][0].get('id') if 'entries' in result else None)
+    if video_id and bg_color is None:
+        cover_pool = ThreadPoolExecutor(max_workers=1)
+        cover_future = cover_pool.submit(fetch_cover_color, video_id)
+        cover_pool.shutdown(wait=False)
+
+    tracks = youtube_utils.extract_tracks(
+        result, output_folder, max_duration=audio_processing.MAX_SEGMENTS * SEGMENT_DURATION
+    )
 
     if not tracks:
         print("[ERROR] No valid tracks found.")
         sys.exit(1)
 
     print(f"[INFO] Beginning to process {len(tracks)} tracks...")
-    all_image_paths = []
-
-    for idx, track in enumerate(tracks, start=1):
-        percent = int((idx - 1) / len(tracks) * 100)
-        print(f"[PROGRESS] {percent}% complete")
-        print(f"[INFO] Processing track {idx}/{len(tracks)}: {track['title']}")
-        try:
-            if 'url' in track:
-                print(f"[DEBUG] Downloading audio for: {track['url']}")
-                audio_file, song_title, _ = youtube_utils.download_youtube_audio_and_metadata(
-                    track['url'],
-                    output_filename=os.path.join(output_folder, f"track_{idx:02d}.wav")
-                )
-            else:
-                print(f"[DEBUG] Using local file: {track['file']}")
-                audio_file = track['file']
-                song_title = track['title']
-
-            print("[DEBUG] Starting audio analysis...")
-            colors = audio_processing.process_audio(audio_file, segment_duration=0.05)
-            print(f"[DEBUG] Generated {len(colors)} colors")
-
-            base_gradient = visualization.create_gradient_image(colors, height=200, target_width=1000)
-            output_filename = f"{idx:02d}_{sanitize_filename(song_title)}.png"
-            full_output_path = os.path.join(output_folder, output_filename)
-
-            visualization.create_track_visualization(
-                base_gradient, song_title, full_output_path
-            )
-            all_image_paths.append(full_output_path)
-
-            print(f"[INFO] Saved visualization: {output_filename}")
-
-        except Exception as e:
-            print(f"[ERROR] Error processing track {idx}: {e}")
+    track_images = {}
+
+    # Tracks are independent: each worker downloads, analyzes and renders one track, so network waits
+    # overlap with FFT and PNG work (both release the GIL) for other tracks
+    with ThreadPoolExecutor(max_workers=TRACK_WORKERS) as pool:
+        futures = {
+            pool.submit(process_track, idx, len(tracks), track, output_folder): idx
+            for idx, track in enumerate(tracks, start=1)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            idx = futures[future]
+            try:
+                track_images[idx] = future.result()
+            except Exception as e:
+                print(f"[ERROR] Error processing track {idx}: {e}")
+            percent = int(done / len(tracks) * 100)
+            print(f"[PROGRESS] {percent}% complete")
+
+    # The rendered tracks are still in memory, so the combined image is stacked from them rather than
+    # decoding every PNG again; the PNGs stay on disk for recoloring from the GUI
+    all_track_images = [track_images[idx][1] for idx in sorted(track_images)]
+
+    if cover_future is not None:
+        bg_color = cover_future.result()
+        if bg_color is not None:
+            print(f"[INFO] Auto-detected background color from album cover: RGB{bg_color}")
+        else:
+            print("[WARN] No usable thumbnail found, using fallback background color.")
 
     print("[INFO] Creating combined image...")
     try:
         combined_path = visualization.create_combined_image(
-            all_image_paths,
+            all_track_images,
             output_folder,
             album_title,
             bg_color
@@ -148,7 +200,7 @@ def main():
         if f.startswith("temp_audio."):
             try:
                 os.remove(f)
-            except:
+            except OSError:
                 pass
 
 
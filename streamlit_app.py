@@ -1,12 +1,14 @@
 import streamlit as st
 import os
 import sys
+import subprocess
 import tempfile
-import audio_processing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import visualization
 import youtube_utils
-from config import sanitize_filename
-import matplotlib.pyplot as plt
+from config import sanitize_filename, ANALYSIS_SAMPLE_RATE
+from audio_processing import MAX_SEGMENTS
+from main import process_track, TRACK_WORKERS, SEGMENT_DURATION
 
 # Set page configuration
 st.set_page_config(
@@ -104,52 +106,35 @@ def process_and_display_tracks(tracks, album_title):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    all_image_paths = []
-    all_gradient_images = []
-    
-    # Process each track
-    for idx, track in enumerate(tracks, start=1):
-        status_text.text(f"Processing track {idx}/{len(tracks)}: {track['title']}")
-        
-        try:
-            # Download if URL is provided, otherwise use existing file
-            if 'url' in track:
-                audio_file, song_title, _ = youtube_utils.download_youtube_audio_and_metadata(
-                    track['url'], 
-                    output_filename=os.path.join(temp_dir, f"track_{idx:02d}.wav")
-                )
-            else:
-                audio_file = track['file']
-                song_title = track['title']
-            
-            # Process the audio to generate colors
-            colors = audio_processing.process_audio(audio_file, segment_duration=0.05)
-            
-            # Create the gradient image
-            base_gradient = visualization.create_gradient_image(colors, height=200)
-            all_gradient_images.append(base_gradient)
-            
-            # Create visualization and save
-            output_filename = f"{idx:02d}_{sanitize_filename(song_title)}.png"
-            full_output_path = os.path.join(temp_dir, output_filename)
-            
-            visualization.create_track_visualization(
-                base_gradient, song_title, full_output_path
-            )
-            all_image_paths.append(full_output_path)
-            
+    track_images = {}
+
+    # Tracks are independent, so they are fetched, analyzed and rendered concurrently by main's track
+    # worker; Streamlit elements are only updated from this script thread as each track finishes
+    with ThreadPoolExecutor(max_workers=TRACK_WORKERS) as pool:
+        futures = {
+            pool.submit(process_track, idx, len(tracks), track, temp_dir): (idx, track)
+            for idx, track in enumerate(tracks, start=1)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            idx, track = futures[future]
+            try:
+                track_images[idx] = future.result()
+                status_text.text(f"Processed track {done}/{len(tracks)}: {track['title']}")
+            except Exception as e:
+                st.error(f"Error processing track {idx}: {str(e)}")
+
             # Update progress
-            progress_bar.progress((idx) / len(tracks))
-            
-        except Exception as e:
-            st.error(f"Error processing track {idx}: {str(e)}")
-    
+            progress_bar.progress(done / len(tracks))
+
+    all_image_paths = [track_images[idx][0] for idx in sorted(track_images)]
+    all_track_images = [track_images[idx][1] for idx in sorted(track_images)]
+
     status_text.text("Creating combined visualization...")
     
     # Create the combined image
     if all_image_paths:
         combined_path = visualization.create_combined_image(
-            all_image_paths,
+            all_track_images,
             temp_dir,
             album_title,
             bg_color
@@ -200,15 +185,14 @@ if operation_mode == "Search YouTube":
                     album_title = result.get('title', query)
                     st.success(f"Found: {album_title}")
                     
-                    # Extract tracks based on whether it's a playlist or a single album video
+                    # Extract tracks based on whether it's a playlist, a chaptered album or a single video
                     if 'entries' in result:
-                        # It's a playlist
                         st.info(f"Found playlist with {len(result['entries'])} tracks")
-                        tracks = youtube_utils.extract_tracks_from_playlist(result)
-                    else:
-                        # It's a single video - try to split if it has chapters
-                        st.info(f"Found video, checking for chapters...")
-                        tracks = youtube_utils.split_album_video(result, temp_dir)
+                    elif 'chapters' in result:
+                        st.info(f"Found video with {len(result['chapters'])} chapters")
+                    tracks = youtube_utils.extract_tracks(
+                        result, temp_dir, max_duration=MAX_SEGMENTS * SEGMENT_DURATION
+                    )
                     
                     # Process and display the tracks
                     process_and_display_tracks(tracks, album_title)
@@ -235,13 +219,16 @@ else:
                 original_path = audio_path
                 audio_path = os.path.join(temp_dir, "converted_audio.wav")
                 
+                # Only the first MAX_SEGMENTS segments are analyzed, so decode just that much of the upload
                 try:
                     subprocess.run([
                         'ffmpeg', '-i', original_path, 
+                        '-t', str(MAX_SEGMENTS * SEGMENT_DURATION),
                         '-acodec', 'pcm_s16le', 
-                        '-ar', '44100', 
+                        '-ac', '1',
+                        '-ar', str(ANALYSIS_SAMPLE_RATE),
                         '-y', audio_path
-                    ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 except Exception as e:
                     st.error(f"Error converting audio: {str(e)}")
                     st.stop()
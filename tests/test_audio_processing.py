@@ -0,0 +1,25 @@
+import unittest
+import numpy as np
+from audio_processing import peak_bins
+
+
+class PeakBinsTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        shape = (8, 64)
+        self.spectrum = (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(np.complex64)
+        self.expected_power = np.abs(self.spectrum.astype(np.complex128)) ** 2
+
+    def test_contiguous_band(self):
+        bins = peak_bins(self.spectrum.copy(), 5, 40)
+        np.testing.assert_array_equal(bins, self.expected_power[:, 5:40].argmax(axis=1) + 5)
+
+    def test_column_slice(self):
+        # A column slice isn't C-contiguous, which the in-place real view rejects on numpy < 1.23
+        band = self.spectrum[:, 5:40]
+        self.assertFalse(band.flags.c_contiguous)
+        np.testing.assert_array_equal(peak_bins(band), self.expected_power[:, 5:40].argmax(axis=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,26 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patheffects as PathEffects
 from PIL import Image, ImageDraw, ImageFont
-from collections import Counter
-from io import BytesIO
+from functools import lru_cache
 import os
 from config import sanitize_filename, get_text_color, get_font_path_from_matplotlib
 
 def create_gradient_image(colors, height=100, target_width=1000):
-    """Create a consistent-width gradient image from color list"""
+    """Create a consistent-width gradient image from an (N, 3) uint8 color array (or list of RGB tuples).
+    The result is a read-only view; copy it before drawing on it in place"""
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
     width = len(colors)
     if width == 0:
-        return np.zeros((height, target_width, 3), dtype=np.uint8)
+        return np.broadcast_to(np.zeros(3, dtype=np.uint8), (height, target_width, 3))
 
-    img = np.zeros((height, target_width, 3), dtype=np.uint8)
-
-    for i in range(min(width, target_width)):
-        img[:, i, :] = colors[i]
+    row = np.empty((target_width, 3), dtype=np.uint8)
+    row[:min(width, target_width)] = colors[:target_width]
 
     # If there's a bunch of silence fill remaining with last valid color until it reaches target width (this is to handle a glitch)
     if width < target_width:
-        img[:, width:, :] = colors[-1]
+        row[width:] = colors[-1]
 
-    return img
+    # Every row is identical, so return a read-only broadcast view instead of copying the row height times
+    return np.broadcast_to(row, (height, target_width, 3))
 
 
 def get_dominant_color(images):
@@ -35,94 +33,109 @@ def get_dominant_color(images):
         else:
             pil_img = img
 
+        # Let libjpeg decode a not-yet-loaded JPEG (e.g. a 1280x720 cover) straight at 1/2-1/8 scale;
+        # a no-op for other formats and already loaded images
+        pil_img.draft('RGB', (50, 50))
         pil_img = pil_img.resize((50, 50))
-        pixels = list(pil_img.getdata())
 
-        filtered = [p[:3] for p in pixels if isinstance(p, tuple) and 20 < sum(p[:3]) < 740]
-        all_pixels.extend(filtered)
+        # Single-band images (grayscale, palette) have no color channels to average
+        bands = len(pil_img.getbands())
+        if bands < 3:
+            continue
+
+        pixels = np.asarray(pil_img).reshape(-1, bands)[:, :3].astype(np.int32)
+        brightness = pixels.sum(axis=1)
+        all_pixels.append(pixels[(brightness > 20) & (brightness < 740)])
 
-    if not all_pixels:
+    all_pixels = np.concatenate(all_pixels) if all_pixels else np.empty((0, 3))
+    if len(all_pixels) == 0:
         return (0, 0, 0)
 
-    avg = tuple(int(np.mean([p[i] for p in all_pixels])) for i in range(3))
+    avg = tuple(int(c) for c in all_pixels.mean(axis=0))
     print(f"\nCalculated average RGB color from album art: {avg}")
     return avg
 
 def create_track_visualization(gradient_image, title, output_path):
-    """Create visualization for a single track"""
+    """Create and save the visualization for a single track, returning the rendered PIL image"""
+    img = render_track_visualization(gradient_image, title)
+
+    # The combined image is built from the returned pixels, so the saved file is only a per-track
+    # export and is written at fast PNG compression
+    img.save(output_path, compress_level=1)
+
+    return img
+
+def render_track_visualization(gradient_image, title):
+    """Render a single track's titled gradient as a PIL image without saving it"""
     # Fixed output dimensions
     final_width = 1000
     final_height = 100
     dpi = 100
-    fig_w = final_width / dpi
-    fig_h = final_height / dpi
-    
-    # Create the image with matplotlib
-    plt.figure(figsize=(fig_w, fig_h), dpi=dpi)
-    plt.imshow(gradient_image, aspect='auto')
-    plt.axis('off')
-    
+
+    img = Image.fromarray(gradient_image)
+    if img.size != (final_width, final_height):
+        img = img.resize((final_width, final_height), Image.NEAREST)
+
     # Determine text color based on average brightness of bottom-left area
-    corner_region = gradient_image[-30:, :30, :]  
+    corner_region = gradient_image[-30:, :30, :]
     avg_color = np.mean(corner_region, axis=(0, 1))
     brightness = (0.299 * avg_color[0] + 0.587 * avg_color[1] + 0.114 * avg_color[2]) / 255
-    text_color = 'black' if brightness > 0.5 else 'white'
-    
-    # Create text with improved styling
-    font_size = int(final_height * 0.18)  # Larger text
-    text = plt.text(
-        0.01, 0.01,
+    text_color = (0, 0, 0) if brightness > 0.5 else (255, 255, 255)
+    outline_color = (255, 255, 255) if text_color == (0, 0, 0) else (0, 0, 0)
+
+    # Font size is specified in points and the title is italic, as it was when this was drawn with matplotlib
+    font_size = int(final_height * 0.18 * dpi / 72)
+    font = load_title_font(font_size, italic=True)
+
+    # Draw text in the bottom-left corner with an outline for better visibility
+    draw = ImageDraw.Draw(img)
+    draw.text(
+        (int(final_width * 0.01), final_height - int(final_height * 0.01)),
         title,
-        color=text_color,
-        fontsize=font_size,
-        fontname='Forte',
-        fontstyle='italic',  # Italic for style
-        transform=plt.gca().transAxes,
-        va='bottom',
-        ha='left'
+        font=font,
+        fill=text_color,
+        stroke_width=2,
+        stroke_fill=outline_color,
+        anchor="ld"
     )
-    
-    # Add outline with opposite color for better visibility
-    outline_color = 'white' if text_color == 'black' else 'black'
-    text.set_path_effects([
-        PathEffects.withStroke(linewidth=3, foreground=outline_color)
-    ])
-    
-    # Save to a BytesIO object first
-    buf = BytesIO()
-    plt.savefig(
-        buf,
-        dpi=dpi,
-        bbox_inches='tight',
-        pad_inches=0,
-        format='png'
-    )
-    plt.close()
-    
-    # Convert to PIL Image and save
-    buf.seek(0)
-    img = Image.open(buf)
-    img.save(output_path)
-    
-    return output_path
+
+    return img
+
+@lru_cache(maxsize=64)
+def load_title_font(font_size, italic=False):
+    """Load the Forte title font at the given size, falling back to Arial Bold (Bold Italic when italic)
+    or PIL's default font. Cached per size and style so the font file is only located and parsed once per run"""
+    # Forte ships a single face that is already slanted, so italic only changes the fallback
+    font_path = get_font_path_from_matplotlib('Forte') or ("arialbi.ttf" if italic else "arialbd.ttf")
+    try:
+        return ImageFont.truetype(font_path, font_size)
+    except OSError:
+        return ImageFont.load_default()
+
+def open_stack_image(img_file):
+    """Open a stack input given as a file path or a numpy array"""
+    if isinstance(img_file, str):
+        return Image.open(img_file)
+    return Image.fromarray(img_file)
 
 def stack_images_with_margin(image_files, margin=10, border=30, bg_color=None, album_title=None):
     """Stack multiple images with margin between them and border around with adaptive title sizing"""
     if not image_files:
         return None
     
-    # Load images
-    images = []
+    # Only image headers are read up front; pixels are decoded one image at a time when pasted
+    sizes = []
     for img_file in image_files:
-        if isinstance(img_file, str):
-            img = Image.open(img_file)
-        else:
-            img = Image.fromarray(img_file)
-        images.append(img)
+        with open_stack_image(img_file) as img:
+            sizes.append(img.size)
     
     # If no background color specified, determine from images
     if bg_color is None:
-        bg_color = get_dominant_color(images)
+        thumbnails = []
+        for img_file in image_files:
+            with open_stack_image(img_file) as img:
+                thumbnails.append(img.resize((50, 50)))
+        bg_color = get_dominant_color(thumbnails)
         print(f"Using detected background color: RGB{bg_color}")
     else:
         print(f"Using user-specified background color: RGB{bg_color}")
@@ -131,8 +144,8 @@ def stack_images_with_margin(image_files, margin=10, border=30, bg_color=None, a
     text_color = get_text_color(bg_color)
     
     # Determine dimensions
-    width = max(img.width for img in images)
-    total_height = sum(img.height for img in images) + margin * (len(images) - 1)
+    width = max(w for w, h in sizes)
+    total_height = sum(h for w, h in sizes) + margin * (len(sizes) - 1)
     
     # Calculate ideal title height based on image dimensions
     # For wider images, we can use a larger title area
@@ -163,8 +176,6 @@ def stack_images_with_margin(image_files, margin=10, border=30, bg_color=None, a
     # Add album title if provided
     if album_title and title_height > 0:
         try:
-            from PIL import ImageFont, ImageDraw
-            
             # Simplify display title
             if " [" in album_title:
                 display_title = album_title.split(" [")[0]
@@ -175,58 +186,44 @@ def stack_images_with_margin(image_files, margin=10, border=30, bg_color=None, a
 
             draw = ImageDraw.Draw(combined)
 
-            # Font loading
-            forte_path = get_font_path_from_matplotlib('Forte')
-            fallback_font = "arialbd.ttf"  # You can adjust this if you want another fallback
-            font_path = forte_path or fallback_font
-
             max_font_size = int(title_height * 0.7)
             min_font_size = 20
 
+            text_color = get_text_color(bg_color)
+            outline_color = (0, 0, 0) if text_color == (255, 255, 255) else (255, 255, 255)
+            anchor_x = (width + 2 * border) // 2
+
             # Try to fit title in one line
+            fits_one_line = False
             for font_size in range(max_font_size, min_font_size - 1, -2):
-                font = ImageFont.truetype(font_path, font_size)
+                font = load_title_font(font_size)
                 bbox = draw.textbbox((0, 0), display_title, font=font)
                 text_width = bbox[2] - bbox[0]
                 if text_width <= width:
+                    fits_one_line = True
                     break
+
+            # Outlines are drawn with Pillow's native stroke rather than stamping the text at offsets
+            if fits_one_line:
+                outline_size = max(2, int(font_size * 0.05))
+                draw.text((anchor_x, title_height // 2), display_title, fill=text_color, font=font, anchor="mm",
+                          stroke_width=outline_size, stroke_fill=outline_color)
+                print(f"Added title: '{display_title}' with font size {font_size}")
             else:
                 # If no font size fits, break into two lines
                 words = display_title.split()
                 midpoint = len(words) // 2
                 line1 = ' '.join(words[:midpoint])
                 line2 = ' '.join(words[midpoint:])
-                line1_font = ImageFont.truetype(font_path, max(min_font_size, int(title_height * 0.35)))
-                line2_font = ImageFont.truetype(font_path, max(min_font_size, int(title_height * 0.35)))
-
-                text_color = get_text_color(bg_color)
-                outline_color = (0, 0, 0) if text_color == (255, 255, 255) else (255, 255, 255)
-                anchor_x = (width + 2 * border) // 2
+                line_font = load_title_font(max(min_font_size, int(title_height * 0.35)))
                 y1 = int(title_height * 0.3)
                 y2 = int(title_height * 0.7)
 
-                for dx, dy in [(-1, -1), (1, -1), (-1, 1), (1, 1)]:
-                    draw.text((anchor_x + dx, y1 + dy), line1, font=line1_font, fill=outline_color, anchor="mm")
-                    draw.text((anchor_x + dx, y2 + dy), line2, font=line2_font, fill=outline_color, anchor="mm")
-
-                draw.text((anchor_x, y1), line1, font=line1_font, fill=text_color, anchor="mm")
-                draw.text((anchor_x, y2), line2, font=line2_font, fill=text_color, anchor="mm")
+                draw.text((anchor_x, y1), line1, font=line_font, fill=text_color, anchor="mm",
+                          stroke_width=1, stroke_fill=outline_color)
+                draw.text((anchor_x, y2), line2, font=line_font, fill=text_color, anchor="mm",
+                          stroke_width=1, stroke_fill=outline_color)
                 print(f"Added title in two lines: '{line1}' / '{line2}'")
-                return combined  # Skip single-line drawing below
-
-            # If it fit in one line
-            font = ImageFont.truetype(font_path, font_size)
-            text_color = get_text_color(bg_color)
-            outline_color = (0, 0, 0) if text_color == (255, 255, 255) else (255, 255, 255)
-            outline_size = max(2, int(font_size * 0.05))
-            x = (width + 2 * border) // 2
-            y = title_height // 2
-
-            for dx, dy in [(-outline_size, -outline_size), (outline_size, -outline_size),
-                        (-outline_size, outline_size), (outline_size, outline_size)]:
-                draw.text((x + dx, y + dy), display_title, fill=outline_color, font=font, anchor="mm")
-            draw.text((x, y), display_title, fill=text_color, font=font, anchor="mm")
-            print(f"Added title: '{display_title}' with font size {font_size}")
 
         except Exception as e:
             print(f"Title rendering error: {e}")
@@ -234,11 +231,12 @@ def stack_images_with_margin(image_files, margin=10, border=30, bg_color=None, a
     
     # Paste images with margins
     y_offset = border + title_height
-    for img in images:
-        # Center horizontally if narrower than max width
-        x_offset = border + (width - img.width) // 2
-        combined.paste(img, (x_offset, y_offset))
-        y_offset += img.height + margin
+    for img_file in image_files:
+        with open_stack_image(img_file) as img:
+            # Center horizontally if narrower than max width
+            x_offset = border + (width - img.width) // 2
+            combined.paste(img, (x_offset, y_offset))
+            y_offset += img.height + margin
     
     return combined
 
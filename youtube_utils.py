@@ -1,130 +1,229 @@
 import os
-import re
+import contextlib
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from yt_dlp import YoutubeDL
+from config import ANALYSIS_SAMPLE_RATE
 
-def download_youtube_audio_and_metadata(url, output_filename='audio.wav'):
+# Number of chapters of an album video extracted at once
+CHAPTER_WORKERS = 4
+
+# Option sets for the metadata-only YoutubeDL instances. Playlist entries are only ever used for their id
+# and title, so they are never resolved video by video, and the DASH/HLS manifests are skipped where
+# nothing picks a format from them
+YDL_PROFILES = {
+    'search': {
+        'quiet': True,
+        'skip_download': True,
+        'extract_flat': True,
+        'no_warnings': True,
+        'extractor_args': {'youtube': {'skip': ['dash', 'hls']}},
+    },
+    'info': {
+        'quiet': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'extractor_args': {'youtube': {'skip': ['dash', 'hls']}},
+    },
+    'stream': {
+        'format': 'bestaudio/best',
+        'quiet': True,
+    },
+}
+
+# Building a YoutubeDL (extractor setup, cookie jar, HTTP pool) is slow and instances aren't thread-safe,
+# so each thread keeps one per profile and reuses it for every lookup
+thread_ydls = threading.local()
+
+def get_ydl(profile):
+    """Return this thread's YoutubeDL for the given YDL_PROFILES entry, creating it on first use"""
+    ydl = getattr(thread_ydls, profile, None)
+    if ydl is None:
+        ydl = YoutubeDL(YDL_PROFILES[profile])
+        setattr(thread_ydls, profile, ydl)
+    return ydl
+
+def ffmpeg_stream_input(info):
+    """Build the ffmpeg input arguments that read a resolved video's audio stream straight over HTTP"""
+    headers = ''.join(f"{key}: {value}\r\n" for key, value in info.get('http_headers', {}).items())
+    if headers:
+        return ['-headers', headers, '-i', info['url']]
+    return ['-i', info['url']]
+
+def stream_youtube_audio(url, output_filename, max_duration):
+    """Decode only the first max_duration seconds of a video's audio straight from its stream URL"""
+    info = get_ydl('stream').extract_info(url, download=False)
+
+    # ffmpeg reads the stream over HTTP and stops after max_duration, so the rest of the track is never fetched
+    command = [
+        'ffmpeg', *ffmpeg_stream_input(info), '-t', str(max_duration), '-acodec', 'pcm_s16le', '-ac', '1',
+        '-ar', str(ANALYSIS_SAMPLE_RATE), '-y', output_filename
+    ]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    print(f"Streamed first {max_duration:g}s of audio to {output_filename} using FFmpeg")
+
+    return output_filename, info.get('title', 'Unknown Title'), info.get('uploader', 'Unknown Artist')
+
+def download_youtube_source(url, temp_base):
+    """Download a video's best audio stream as-is to temp_base.<ext>, returning the file path and video info"""
+    # YouTube throttles long single-request downloads (e.g. a full album), so fetch in 10 MB ranged
+    # requests, and pull DASH/HLS fragments several at a time when the format is fragmented
     options = {
         'format': 'bestaudio/best',
-        'outtmpl': 'temp_audio.%(ext)s',
+        'outtmpl': temp_base.replace('%', '%%') + '.%(ext)s',
         'quiet': True,
+        'http_chunk_size': 10 * 1024 * 1024,
+        'concurrent_fragment_downloads': 4,
     }
     with YoutubeDL(options) as ydl:
         info = ydl.extract_info(url, download=True)
+    return f"{temp_base}.{info['ext']}", info
+
+def download_youtube_audio_and_metadata(url, output_filename='audio.wav', max_duration=None):
+    # Only the start of each track is analyzed, so when the caller says how much it needs, stream just that
+    if max_duration is not None:
+        try:
+            return stream_youtube_audio(url, output_filename, max_duration)
+        except Exception as e:
+            print(f"Error streaming audio, downloading the full file instead: {e}")
+
+    # Download next to the output file so concurrent downloads don't share a temp file
+    temp_filename, info = download_youtube_source(url, os.path.splitext(output_filename)[0] + '.source')
     title = info.get('title', 'Unknown Title')
     artist = info.get('uploader', 'Unknown Artist')
-    temp_filename = f"temp_audio.{info['ext']}"
 
     try:
         subprocess.run([
-            'ffmpeg', '-i', temp_filename, '-acodec', 'pcm_s16le', '-y', output_filename
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            'ffmpeg', '-i', temp_filename, '-acodec', 'pcm_s16le', '-ac', '1',
+            '-ar', str(ANALYSIS_SAMPLE_RATE), '-y', output_filename
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         print(f"Converted {temp_filename} to {output_filename} using FFmpeg")
     except Exception as e:
         print(f"Error converting audio with FFmpeg: {e}")
-        import shutil
-        shutil.copy(temp_filename, output_filename)
-        print(f"Copied original file instead")
+        # Nothing else needs the download, so move it into place instead of copying it
+        os.replace(temp_filename, output_filename)
+        print(f"Used original file instead")
+        return output_filename, title, artist
 
-    try:
+    with contextlib.suppress(OSError):
         os.remove(temp_filename)
-    except:
-        pass
 
     return output_filename, title, artist
 
+@lru_cache(maxsize=64)
+def fetch_info(url, flat=False):
+    """Fetch yt-dlp metadata for a URL or search without downloading.
+    Cached per (url, flat) so repeated searches and loads in a session skip the network round-trip"""
+    return get_ydl('search' if flat else 'info').extract_info(url, download=False)
+
 def search_youtube_playlist(query, selection_index=None, return_entries_only=False):
     if query.startswith("http") and ("list=" in query or "playlist" in query):
         return load_youtube_url(query)
 
-    search_query = f"{query}"
-    options = {
-        'quiet': True,
-        'extract_flat': True,
-        'skip_download': True,
-        'no_warnings': True,
-        'max_results': 8,
-    }
+    # Normalize the query so cosmetic differences (case, surrounding spaces) share a cache entry
+    search_query = " ".join(query.split()).lower()
 
-    with YoutubeDL(options) as ydl_flat:
-        try:
-            results = ydl_flat.extract_info(f"ytsearch8:{search_query}", download=False)
-            entries = results.get('entries', [])
-            if not entries:
-                return None
+    try:
+        results = fetch_info(f"ytsearch8:{search_query}", flat=True)
+        entries = results.get('entries', [])
+        if not entries:
+            return None
 
-            if return_entries_only:
-                return entries
+        if return_entries_only:
+            return entries
 
-            if selection_index is None:
-                env_index = os.environ.get("AUDIOVISUALIZER_SELECTION_INDEX")
-                if env_index is not None and env_index.isdigit():
-                    selection_index = int(env_index)
+        if selection_index is None:
+            env_index = os.environ.get("AUDIOVISUALIZER_SELECTION_INDEX")
+            if env_index is not None and env_index.isdigit():
+                selection_index = int(env_index)
 
-            selected = entries[selection_index] if selection_index is not None else entries[0]
+        selected = entries[selection_index] if selection_index is not None else entries[0]
 
-            eid = selected.get('id')
-            if selected.get('_type') == 'playlist' or 'playlist' in (selected.get('title', '').lower()) or 'list=' in query:
-                real_url = f"https://www.youtube.com/playlist?list={eid}"
-            else:
-                real_url = f"https://www.youtube.com/watch?v={eid}"
+        eid = selected.get('id')
+        if selected.get('_type') == 'playlist' or 'playlist' in (selected.get('title', '').lower()) or 'list=' in query:
+            real_url = f"https://www.youtube.com/playlist?list={eid}"
+        else:
+            real_url = f"https://www.youtube.com/watch?v={eid}"
 
-        except Exception as e:
-            print(f"Search error: {e}")
-            return None
+    except Exception as e:
+        print(f"Search error: {e}")
+        return None
 
     return load_youtube_url(real_url)
 
 def load_youtube_url(link):
     try:
-        with YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
-            info = ydl.extract_info(link, download=False)
+        info = fetch_info(link.strip())
 
-            if 'entries' in info and len(info['entries']) > 1:
-                print(f"✅ Loaded playlist: {info.get('title')} ({len(info['entries'])} tracks)")
-                info['id'] = info.get('id') or info['entries'][0].get('id')
-                return info
+        if 'entries' in info and len(info['entries']) > 1:
+            print(f"✅ Loaded playlist: {info.get('title')} ({len(info['entries'])} tracks)")
+            info['id'] = info.get('id') or info['entries'][0].get('id')
+            return info
 
-            elif 'chapters' in info and len(info['chapters']) > 1:
-                print(f"✅ Loaded chaptered video: {info.get('title')}")
-                info['id'] = info.get('id') or info.get('webpage_url', '').split('=')[-1]
-                return info
+        elif 'chapters' in info and len(info['chapters']) > 1:
+            print(f"✅ Loaded chaptered video: {info.get('title')}")
+            info['id'] = info.get('id') or info.get('webpage_url', '').split('=')[-1]
+            return info
 
-            print("❌ Link must be a playlist or a video with chapters.")
-            return None
+        print("❌ Link must be a playlist or a video with chapters.")
+        return None
     except Exception as e:
         print(f"Error loading YouTube URL: {e}")
         return None
 
-def split_album_video(video_info, output_folder):
-    with YoutubeDL({'quiet': True}) as ydl:
-        full_info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_info['id']}", download=False)
-
-    tracks = []
+def split_album_video(video_info, output_folder, max_duration=None):
+    # Results from load_youtube_url already carry the chapters; only look the video up when they're missing
+    if video_info.get('chapters'):
+        full_info = video_info
+    else:
+        full_info = fetch_info(f"https://www.youtube.com/watch?v={video_info['id']}")
 
     if 'chapters' in full_info and full_info['chapters']:
         print(f"Found {len(full_info['chapters'])} chapters/tracks in the video")
 
-        audio_file, _, _ = download_youtube_audio_and_metadata(
-            f"https://www.youtube.com/watch?v={video_info['id']}",
-            output_filename=os.path.join(output_folder, 'full_album.wav')
-        )
+        video_url = f"https://www.youtube.com/watch?v={video_info['id']}"
+        album_source = os.path.join(output_folder, 'full_album.source')
+        source_file = None
+        source_input = None
 
-        try:
-            result = subprocess.run(
-                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                 '-of', 'default=noprint_wrappers=1:nokey=1', audio_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            full_duration = float(result.stdout.strip())
+        # With max_duration only the start of each chapter is analyzed, so each chapter's ffmpeg seeks into
+        # the audio stream over HTTP and fetches just that window, all chapters at once, instead of waiting
+        # for the whole album to download first
+        if max_duration is not None:
+            try:
+                source_input = ffmpeg_stream_input(get_ydl('stream').extract_info(video_url, download=False))
+            except Exception as e:
+                print(f"Error resolving audio stream, downloading the full album instead: {e}")
+
+        # Otherwise keep the download compressed and have ffmpeg decode each chapter straight out of it,
+        # so the album is never written out as one full-length WAV
+        if source_input is None:
+            source_file, _ = download_youtube_source(video_url, album_source)
+            source_input = ['-i', source_file]
+
+        full_duration = full_info.get('duration')
+        if full_duration:
             print(f"Full audio duration: {full_duration:.2f} seconds")
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            full_duration = full_info['chapters'][-1]['end_time'] + 1
+        else:
+            try:
+                result = subprocess.run(
+                    ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                     '-of', 'default=noprint_wrappers=1:nokey=1', *source_input],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+                full_duration = float(result.stdout.strip())
+                print(f"Full audio duration: {full_duration:.2f} seconds")
+            except Exception as e:
+                print(f"Error getting audio duration: {e}")
+                full_duration = full_info['chapters'][-1]['end_time'] + 1
 
-        for idx, chapter in enumerate(full_info['chapters'], start=1):
+        def extract_chapter(idx, chapter, input_args):
+            chapter_filename = os.path.join(output_folder, f"track_{idx:02d}.wav")
             try:
                 chapter_title = chapter.get('title', f"Track {idx}")
                 start_time = chapter.get('start_time', 0)
@@ -136,23 +235,55 @@ def split_album_video(video_info, output_folder):
 
                 print(f"  Extracting track {idx}: {chapter_title} ({start_time:.1f}s to {end_time:.1f}s)")
 
-                chapter_filename = os.path.join(output_folder, f"track_{idx:02d}.wav")
+                duration = end_time - start_time
+                if max_duration is not None:
+                    duration = min(duration, max_duration)
+
+                # Seek as an input option so ffmpeg jumps to the chapter instead of decoding from the start
                 subprocess.run([
-                    'ffmpeg', '-i', audio_file,
-                    '-ss', str(start_time), '-to', str(end_time),
-                    '-acodec', 'pcm_s16le', '-y', chapter_filename
-                ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-                if os.path.exists(chapter_filename):
-                    tracks.append({
-                        'id': f"{video_info['id']}_track{idx}",
-                        'title': chapter_title,
-                        'file': chapter_filename
-                    })
-                else:
-                    print(f"  Error: Failed to create track file {chapter_filename}")
+                    'ffmpeg', '-ss', str(start_time), '-t', str(duration), *input_args,
+                    '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(ANALYSIS_SAMPLE_RATE), '-y', chapter_filename
+                ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+                return {
+                    'id': f"{video_info['id']}_track{idx}",
+                    'title': chapter_title,
+                    'file': chapter_filename
+                }
             except Exception as e:
                 print(f"  Error extracting track {idx}: {e}")
+                # Don't leave a truncated WAV behind to be mistaken for the whole chapter
+                with contextlib.suppress(OSError):
+                    os.remove(chapter_filename)
+            return None
+
+        # Chapters are independent; decode them concurrently while map keeps the tracks in chapter order
+        chapters = full_info['chapters']
+        with ThreadPoolExecutor(max_workers=CHAPTER_WORKERS) as pool:
+            tracks = list(pool.map(extract_chapter, range(1, len(chapters) + 1), chapters, repeat(source_input)))
+
+            # A stream URL can expire or be refused (e.g. a 403) partway through, so any chapter that couldn't
+            # be read from it is retried from a single full download, as download_youtube_audio_and_metadata
+            # does for single tracks
+            failed = [idx for idx, track in enumerate(tracks, start=1) if track is None]
+            if failed and source_file is None:
+                print(f"Error streaming {len(failed)} chapter(s), downloading the full album instead")
+                try:
+                    source_file, _ = download_youtube_source(video_url, album_source)
+                except Exception as e:
+                    print(f"Error downloading the full album: {e}")
+                else:
+                    retried = pool.map(
+                        extract_chapter, failed, [chapters[idx - 1] for idx in failed], repeat(['-i', source_file])
+                    )
+                    for idx, track in zip(failed, retried):
+                        tracks[idx - 1] = track
+
+        tracks = [track for track in tracks if track is not None]
+
+        if source_file is not None:
+            with contextlib.suppress(OSError):
+                os.remove(source_file)
 
         return tracks
 
@@ -162,14 +293,30 @@ def split_album_video(video_info, output_folder):
         'url': f"https://www.youtube.com/watch?v={video_info['id']}"
     }]
 
+def extract_tracks(result, output_folder, max_duration=None):
+    """Turn a loaded playlist, chaptered video or single video into the list of tracks to visualize"""
+    if 'entries' in result:
+        print(f"[INFO] Found playlist: {result.get('title')} with {len(result['entries'])} tracks")
+        return extract_tracks_from_playlist(result)
+    elif 'chapters' in result:
+        print(f"[INFO] Found chaptered video: {result.get('title')}")
+        return split_album_video(result, output_folder, max_duration=max_duration)
+
+    print(f"[INFO] Found single video: {result.get('title')}")
+    return [{
+        'id': result['id'],
+        'title': result.get('title', 'Full Album'),
+        'url': f"https://www.youtube.com/watch?v={result['id']}"
+    }]
+
 def extract_tracks_from_playlist(playlist_info):
-    tracks = []
-    if 'entries' in playlist_info:
-        for entry in playlist_info['entries']:
-            if entry and isinstance(entry, dict) and 'id' in entry:
-                tracks.append({
-                    'id': entry['id'],
-                    'title': entry.get('title', 'Unknown Track'),
-                    'url': f"https://www.youtube.com/watch?v={entry['id']}"
-                })
-    return tracks
+    # Unavailable videos show up as None entries, so those (and anything without an id) are skipped
+    return [
+        {
+            'id': entry['id'],
+            'title': entry.get('title', 'Unknown Track'),
+            'url': f"https://www.youtube.com/watch?v={entry['id']}"
+        }
+        for entry in playlist_info.get('entries') or ()
+        if isinstance(entry, dict) and 'id' in entry
+    ]